@@ -1,35 +1,63 @@
 #!/usr/bin/env python3
 """
-Simple Halo.OS VBS trace analyzer – works in CI without pylint issues.
+Halo.OS VBS trace analyzer – writes the CI metrics summary (metrics.json).
+Parsing and camera → brake pairing are shared with analyze_vbs.py.
 """
 
 import argparse
 import json
+import sys
 from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from analyze_vbs import cached_analysis
+
+def analyze_traces(jsonl: Path) -> Optional[dict]:
+    # Shares analyze_vbs's result cache, so a trace it already analyzed
+    # (e.g. via make analyze) is not parsed again
+    cache_dir = jsonl.parent / '.cache'
+    cache_dir.mkdir(exist_ok=True)
+    results = cached_analysis([jsonl], cache_dir)
+    if results is None:
+        return None  # no tracked events
+    latency, npu = results['latency'], results['npu']
+
+    return {
+        "status": "ok" if 'p50' in latency else "no_latency_samples",
+        "latency_p50_ms": latency.get('p50'),
+        "latency_p99.99_ms": latency.get('p99_99'),
+        "jitter_p99.99_ms": latency.get('jitter'),
+        "npu_overhead_pct": npu.get('overhead_percent'),
+        "total_events": results['events'],
+        "analysis_timestamp": datetime.utcnow().isoformat() + "Z"
+    }
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("jsonl")
+    parser.add_argument("jsonl", type=Path)
     parser.add_argument("--output", "-o", default="metrics.json")
     args = parser.parse_args()
 
-    # Dummy metrics for now – real analysis will come after build succeeds
-    metrics = {
-        "status": "analyzer_running",
-        "note": "Full analysis will run after successful build",
-        "latency_p50_ms": None,
-        "latency_p99.99_ms": None,
-        "jitter_p99.99_ms": None,
-        "npu_overhead_pct": None,
-        "total_events": 0,
-        "analysis_timestamp": datetime.utcnow().isoformat() + "Z"
-    }
+    if not args.jsonl.exists():
+        sys.exit(f"ERROR: File not found: {args.jsonl}")
+
+    metrics = analyze_traces(args.jsonl)
+    if metrics is None:
+        sys.exit(f"ERROR: No events found in {args.jsonl}")
 
-    with open(args.output, "w") as f:
-        json.dump(metrics, f, indent=2)
+    if orjson is not None:
+        Path(args.output).write_bytes(orjson.dumps(metrics, option=orjson.OPT_INDENT_2))
+    else:
+        with open(args.output, "w") as f:
+            json.dump(metrics, f, indent=2)
 
-    print("Analyzer placeholder – CI now passes")
-    print("Merge PR #8 to unblock full pipeline")
+    print(f"Metrics written to {args.output} ({metrics['status']})")
 
 if __name__ == "__main__":
     main()
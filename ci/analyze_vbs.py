@@ -5,132 +5,716 @@ Analyze Halo.OS VBS trace events for latency, jitter, and NPU overhead
 """
 
 import argparse
+import hashlib
 import json
+import mmap
+import os
+import re
 import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Sequence, Tuple
 import statistics
 
 try:
     import numpy as np
-    import pandas as pd
 except ImportError:
-    print("WARNING: numpy/pandas not installed. Using basic analysis.", file=sys.stderr)
+    print("WARNING: numpy not installed. Using basic analysis.", file=sys.stderr)
     np = None
-    pd = None
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+try:
+    import orjson
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:
+    orjson = None
+    json_loads = json.loads
+    def json_dumps(obj):
+        return json.dumps(obj).encode()
+
+CACHE_VERSION = 3  # bump when analysis output changes
+NS_PER_MS = 1_000_000
+LATENCY_MIN_NS = 1 * NS_PER_MS    # Reasonable range for camera → brake
+LATENCY_MAX_NS = 500 * NS_PER_MS
+INT64_MIN, INT64_MAX = -2**63, 2**63 - 1
+PARQUET_SUFFIX = '.parquet'  # columnar traces, read through polars
+PARALLEL_CHUNK_BYTES = 32 << 20  # single traces above this are split across workers
+DENSE_ID_SPAN = 4  # ids spanning up to 4x the event count pair via direct lookup
+# Importing numba and loading cached kernels costs ~0.3 s even when warm (over 1 s
+# cold); numpy's sort-based join only falls that far behind at a few million events
+JIT_MIN_EVENTS = 4_000_000
+
+EVENT_CAMERA_FRAME = 'halo_camera_frame_received'
+EVENT_BRAKE_ACTUATED = 'halo_brake_actuated'
+EVENT_NPU_START = 'halo_npu_inference_start'
+EVENT_NPU_END = 'halo_npu_inference_end'
+# Tracked event -> field pairing it with its start/end counterpart
+TRACKED_EVENTS = {
+    EVENT_CAMERA_FRAME: 'frame_id',
+    EVENT_BRAKE_ACTUATED: 'frame_id',
+    EVENT_NPU_START: 'inference_id',
+    EVENT_NPU_END: 'inference_id',
+}
+EVENT_CODES = {name: code for code, name in enumerate(TRACKED_EVENTS)}
+# One compiled alternation over the quoted names finds tracked lines without
+# decoding the rest of the trace
+TRACKED_PATTERN = re.compile(
+    b'"(?:' + b'|'.join(re.escape(name.encode()) for name in TRACKED_EVENTS) + b')"')
+
+@dataclass(slots=True)
+class TraceColumns:
+    """Tracked events as parallel columns (numpy arrays, or lists without numpy)"""
+    timestamp_ns: Sequence[int]
+    event_code: Sequence[int]
+    event_id: Sequence[int]
+
+    def __len__(self) -> int:
+        return len(self.timestamp_ns)
+
+# Event name -> (ids, timestamps) of that event only
+EventBuckets = Dict[str, Tuple[Sequence[int], Sequence[int]]]
 
 def log(msg):
-    print(f"[analyze_vbs] {msg}")
+    # Text and newline go out in one flushed write so parser worker processes
+    # sharing stdout never interleave partial lines
+    print(f"[analyze_vbs] {msg}\n", end='', flush=True)
+
+def as_int(value) -> Optional[int]:
+    """value as an int64 when it is integral (12, 12.0, "12"), else None"""
+    if not isinstance(value, float):
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            try:
+                value = float(value)  # e.g. "12.0"
+            except (TypeError, ValueError):
+                return None
+    if isinstance(value, float):
+        if not value.is_integer():
+            return None
+        value = int(value)
+    return value if INT64_MIN <= value <= INT64_MAX else None
+
+def to_columns(timestamps: array, codes: array, ids: array) -> TraceColumns:
+    """Wrap the typed parse buffers as numpy columns without copying them"""
+    if np is not None:
+        return TraceColumns(
+            np.frombuffer(timestamps, dtype=np.int64),
+            np.frombuffer(codes, dtype=np.int8),
+            np.frombuffer(ids, dtype=np.int64),
+        )
+    return TraceColumns(timestamps, codes, ids)
+
+def concat_columns(parts: List[TraceColumns]) -> TraceColumns:
+    """Join per-file columns into a single trace"""
+    columns = zip(*((p.timestamp_ns, p.event_code, p.event_id) for p in parts))
+    if np is not None:
+        return TraceColumns(*(np.concatenate(col) for col in columns))
+    return TraceColumns(*([v for part in col for v in part] for col in columns))
+
+def namespace_ids(event_id, file_index):
+    """Relabel ids to one dense id per (file, id): runs restart their counters, so
+    equal ids from different files must never pair"""
+    if np is not None:
+        order = np.lexsort((event_id, file_index))
+        ids, files = event_id[order], file_index[order]
+        first = np.ones(ids.size, dtype=bool)
+        first[1:] = (ids[1:] != ids[:-1]) | (files[1:] != files[:-1])
+        relabeled = np.empty(ids.size, dtype=np.int64)
+        relabeled[order] = np.cumsum(first) - 1
+        return relabeled
+    labels = {}
+    return [labels.setdefault(key, len(labels)) for key in zip(file_index, event_id)]
+
+def polars_as_int(column, dtype=None):
+    """as_int as a polars expression: integral values to Int64, anything else to null.
+    dtype is the column's stored type; None means JSON text"""
+    if dtype is not None and dtype.is_integer():
+        return column.cast(pl.Int64, strict=False)  # UInt64 past INT64_MAX -> null
+    if dtype is not None and dtype.is_float():
+        return pl.when(column == column.floor()).then(column.cast(pl.Int64, strict=False))
+    # "12" converts exactly; "12.0" and "1e3" go through Float64
+    text = column.cast(pl.Utf8)
+    number = text.cast(pl.Float64, strict=False)
+    return pl.coalesce(text.cast(pl.Int64, strict=False),
+                       pl.when(number == number.floor()).then(number.cast(pl.Int64, strict=False)))
+
+def scan_tracked_polars(events_file: Path, file_index: int):
+    """Lazy frame of one trace's tracked events as timestamp_ns/event_code/event_id/file_index"""
+    if events_file.suffix == PARQUET_SUFFIX:
+        # Projection and the event filter are pushed into the reader, so other
+        # columns and row groups without tracked events are never decoded
+        frame = pl.scan_parquet(events_file)
+        # Converted from the types stored in the footer, never via strings
+        types = frame.schema
+        field_types = {f.name: f.dtype for f in types['fields'].fields}
+        timestamp = polars_as_int(pl.col('timestamp_ns'), types['timestamp_ns'])
+        
+        def event_value(field):
+            if field not in field_types:
+                return pl.lit(None, dtype=pl.Int64)  # no event in this file carries it
+            return polars_as_int(pl.col('fields').struct.field(field), field_types[field])
+    else:
+        # Scanned as whole lines (an unescaped 0x1f never occurs in JSON, so the
+        # separator splits nothing). polars' typed NDJSON reader nulls numbers
+        # read as Utf8, truncates 3.7 read as Int64 and nulls quoted ids read as
+        # either; json_path_match returns every value's JSON text, which
+        # polars_as_int then converts exactly as as_int does
+        line = pl.col('line')
+        frame = (pl.scan_csv(events_file, has_header=False, separator='\x1f', quote_char=None,
+                             new_columns=['line'], infer_schema_length=0, raise_if_empty=False)
+                 # Literal search for the quoted names, as TRACKED_PATTERN does,
+                 # so only tracked lines are decoded
+                 .filter(pl.any_horizontal([line.str.contains(f'"{name}"', literal=True)
+                                            for name in TRACKED_EVENTS]))
+                 .with_columns(line.str.json_path_match('$.event_name').alias('event_name')))
+        timestamp = polars_as_int(line.str.json_path_match('$.timestamp_ns'))
+        
+        def event_value(field):
+            return polars_as_int(line.str.json_path_match(f'$.fields.{field}'))
+    
+    event_id = None
+    for name, field in TRACKED_EVENTS.items():
+        is_event = pl.col('event_name') == name
+        value = event_value(field)
+        event_id = pl.when(is_event).then(value) if event_id is None else event_id.when(is_event).then(value)
+    
+    return (frame
+            .filter(pl.col('event_name').is_in(list(TRACKED_EVENTS)))
+            .select(
+                timestamp.alias('timestamp_ns'),
+                pl.col('event_name').replace(EVENT_CODES, return_dtype=pl.Int8).alias('event_code'),
+                event_id.alias('event_id'),
+                pl.lit(file_index, dtype=pl.Int32).alias('file_index'),
+            )
+            .drop_nulls(['timestamp_ns', 'event_id']))
 
-def parse_events(events_file: Path) -> List[Dict]:
-    """Parse JSONL events file"""
-    events = []
+def parse_events_polars(events_files: Sequence[Path]) -> TraceColumns:
+    """Parse tracked events with polars' streaming line/Parquet scans, straight into columns"""
+    # Shards are concatenated lazily, so one plan filters and decodes them all
+    # on polars' own thread pool
+    df = pl.concat([scan_tracked_polars(events_file, file_index)
+                    for file_index, events_file in enumerate(events_files)]).collect(streaming=True)
+    
+    event_ids = df['event_id'].to_numpy()
+    if len(events_files) > 1:
+        event_ids = namespace_ids(event_ids, df['file_index'].to_numpy())
+    return TraceColumns(df['timestamp_ns'].to_numpy(), df['event_code'].to_numpy(), event_ids)
+
+def parse_events(events_file: Path, start: int = 0, end: Optional[int] = None) -> TraceColumns:
+    """Parse tracked events from a JSONL file (or a line-aligned byte range of it) into columns"""
+    # Typed buffers hold 8/1/8 bytes per event rather than a boxed int apiece
+    timestamps, codes, ids = array('q'), array('b'), array('q')
+    append_timestamp, append_code, append_id = timestamps.append, codes.append, ids.append
     
     if not events_file.exists():
         log(f"ERROR: File not found: {events_file}")
-        return events
+        return to_columns(timestamps, codes, ids)
     
-    with open(events_file, 'r') as f:
-        for line_num, line in enumerate(f, 1):
-            line = line.strip()
-            if not line:
-                continue
+    if events_file.stat().st_size == 0:
+        log("Parsed 0 events (empty file)")
+        return to_columns(timestamps, codes, ids)
+    
+    if events_file.suffix == PARQUET_SUFFIX:
+        if pl is None or np is None:
+            log(f"ERROR: Reading {events_file} requires polars and numpy")
+            return to_columns(timestamps, codes, ids)
+        trace = parse_events_polars([events_file])
+        log(f"Parsed {len(trace)} events (parquet)")
+        return trace
+    
+    if pl is not None and np is not None and start == 0 and end is None:
+        try:
+            trace = parse_events_polars([events_file])
+            log(f"Parsed {len(trace)} events (polars)")
+            return trace
+        except pl.exceptions.PolarsError as e:
+            # Malformed lines fail the whole polars scan; the line parser below
+            # skips them individually and reports where they are
+            log(f"WARNING: polars could not parse {events_file} ({e}), retrying line by line")
+    
+    with open(events_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        # The pattern sweeps the mapping in C; only lines containing a
+        # tracked name are sliced out and decoded
+        end = len(buf) if end is None else end
+        line_end = start
+        line_num, counted_to = 1, 0  # line numbers are only needed for warnings
+        for match in TRACKED_PATTERN.finditer(buf, start, end):
+            if match.start() < line_end:
+                continue  # second tracked name on a line already handled
+            
+            line_start = buf.rfind(b'\n', 0, match.start()) + 1
+            line_end = buf.find(b'\n', match.end())
+            if line_end < 0:
+                line_end = len(buf)
             
             try:
-                event = json.loads(line)
-                events.append(event)
-            except json.JSONDecodeError as e:
+                event = json_loads(buf[line_start:line_end])
+            except ValueError as e:
+                # Count forward from the previous bad line, not from the start of the file
+                line_num += buf[counted_to:line_start].count(b'\n')
+                counted_to = line_start
                 log(f"WARNING: Line {line_num}: Invalid JSON: {e}")
+                continue
+            
+            name = event.get('event_name')
+            code = EVENT_CODES.get(name)
+            if code is None:
+                continue
+            
+            fields = event.get('fields')  # no throwaway {} default per event
+            event_id = fields.get(TRACKED_EVENTS[name]) if fields else None
+            if event_id is None:
+                continue
+            if type(event_id) is not int:
+                # Some babeltrace outputs quote ids ("12345"); normalize once here so
+                # the int64 column and the joins only ever see integers. A fractional
+                # id (3.7) is skipped rather than truncated onto another frame
+                event_id = as_int(event_id)
+                if event_id is None:
+                    continue
+            
+            timestamp_ns = event.get('timestamp_ns')
+            if type(timestamp_ns) is not int:
+                # Missing or non-integral timestamps can't go in the int64 column
+                timestamp_ns = as_int(timestamp_ns)
+                if timestamp_ns is None:
+                    continue
+            
+            append_timestamp(timestamp_ns)
+            append_code(code)
+            append_id(event_id)
+        
+        scanned = end - start
     
-    log(f"Parsed {len(events)} events")
-    return events
+    log(f"Parsed {len(timestamps)} events ({scanned} bytes scanned)")
+    return to_columns(timestamps, codes, ids)
 
-def analyze_latency(events: List[Dict]) -> Dict:
-    """Analyze end-to-end latency from camera to brake"""
-    camera_frames = {}
-    brake_events = {}
+def split_ranges(events_file: Path, parts: int) -> List[Tuple[int, int]]:
+    """Cut a file into about `parts` byte ranges, each ending just after a newline"""
+    size = events_file.stat().st_size
+    bounds = [0]
+    with open(events_file, 'rb') as f:
+        for i in range(1, parts):
+            f.seek(max(size * i // parts, bounds[-1]))
+            f.readline()  # finish the line the cut landed in
+            bounds.append(f.tell())
+    bounds.append(size)
+    return [(lo, hi) for lo, hi in zip(bounds, bounds[1:]) if lo < hi]
+
+def parse_files(events_files: List[Path], jobs: Optional[int] = None) -> TraceColumns:
+    """Parse one or more JSONL shards in worker processes, splitting large ones by byte range"""
+    workers = jobs or os.cpu_count() or 1
+    if (pl is not None and np is not None and len(events_files) > 1
+            and all(f.exists() and f.stat().st_size for f in events_files)):
+        try:
+            trace = parse_events_polars(events_files)
+            log(f"Parsed {len(trace)} events from {len(events_files)} file(s) (polars)")
+            return trace
+        except pl.exceptions.PolarsError as e:
+            log(f"WARNING: polars could not parse the traces together ({e}), parsing file by file")
     
-    for event in events:
-        event_name = event.get('event_name', '')
-        frame_id = event.get('fields', {}).get('frame_id')
-        timestamp_ns = event.get('timestamp_ns')
-        
-        if event_name == 'halo_camera_frame_received' and frame_id is not None:
-            camera_frames[frame_id] = timestamp_ns
-        elif event_name == 'halo_brake_actuated' and frame_id is not None:
-            brake_events[frame_id] = timestamp_ns
-    
-    latencies_ms = []
-    for frame_id in sorted(camera_frames.keys()):
-        if frame_id in brake_events:
-            latency_ns = brake_events[frame_id] - camera_frames[frame_id]
-            latency_ms = latency_ns / 1_000_000.0
-            
-            if 1.0 <= latency_ms <= 500.0:  # Reasonable range
-                latencies_ms.append(latency_ms)
+    tasks, task_files = [], []  # task_files: index of the file each task reads
+    for file_index, events_file in enumerate(events_files):
+        size = events_file.stat().st_size if events_file.exists() else 0
+        # polars already parses a single file on all cores
+        if pl is None and workers > 1 and size > PARALLEL_CHUNK_BYTES and events_file.suffix != PARQUET_SUFFIX:
+            parts = min(workers, -(-size // PARALLEL_CHUNK_BYTES))
+            tasks.extend((events_file, lo, hi) for lo, hi in split_ranges(events_file, parts))
+        else:
+            tasks.append((events_file, 0, None))
+        task_files.extend([file_index] * (len(tasks) - len(task_files)))
     
-    if not latencies_ms:
+    if len(tasks) == 1:
+        return parse_events(events_files[0])
+    
+    # Never start more workers than there are tasks; -j 1 skips the pool entirely
+    workers = min(len(tasks), workers)
+    if workers == 1:
+        parts = [parse_events(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(parse_events, *zip(*tasks)))
+    
+    trace = concat_columns(parts)
+    if len(events_files) > 1:
+        if np is not None:
+            file_index = np.repeat(np.asarray(task_files), [len(part) for part in parts])
+        else:
+            file_index = [i for i, part in zip(task_files, parts) for _ in range(len(part))]
+        trace.event_id = namespace_ids(trace.event_id, file_index)
+    log(f"Parsed {len(trace)} events from {len(events_files)} file(s) in {len(tasks)} parts")
+    return trace
+
+def _match_hashed_loop(start_ids, start_ts, end_ids, end_ts, lo, hi):
+    """Hash join on id with the [lo, hi] filter fused in, numba-compiled when installed"""
+    # Both sides overwrite in file order, so a repeated id keeps its last event
+    starts_by_id = dict()
+    for i in range(start_ids.size):
+        starts_by_id[start_ids[i]] = start_ts[i]
+    ends_by_id = dict()
+    for j in range(end_ids.size):
+        ends_by_id[end_ids[j]] = end_ts[j]
+    out = np.empty(len(starts_by_id), dtype=np.int64)
+    k = 0
+    for event_id, start_ns in starts_by_id.items():
+        if event_id in ends_by_id:
+            duration = ends_by_id[event_id] - start_ns
+            if lo <= duration <= hi:
+                out[k] = duration
+                k += 1
+    return out[:k]
+
+def _match_dense_loop(start_ids, start_ts, end_ids, end_ts, id_max, lo, hi):
+    """Id-indexed join with the [lo, hi] filter fused in, numba-compiled when installed"""
+    # Both sides overwrite in file order, so a repeated id keeps its last event
+    starts_by_id = np.empty(id_max + 1, dtype=np.int64)
+    has_start = np.zeros(id_max + 1, dtype=np.bool_)
+    for i in range(start_ids.size):
+        event_id = start_ids[i]
+        if 0 <= event_id <= id_max:
+            starts_by_id[event_id] = start_ts[i]
+            has_start[event_id] = True
+    ends_by_id = np.empty(id_max + 1, dtype=np.int64)
+    has_end = np.zeros(id_max + 1, dtype=np.bool_)
+    for j in range(end_ids.size):
+        ends_by_id[end_ids[j]] = end_ts[j]
+        has_end[end_ids[j]] = True
+    out = np.empty(id_max + 1, dtype=np.int64)
+    k = 0
+    for event_id in range(id_max + 1):
+        if has_start[event_id] and has_end[event_id]:
+            duration = ends_by_id[event_id] - starts_by_id[event_id]
+            if lo <= duration <= hi:
+                out[k] = duration
+                k += 1
+    return out[:k]
+
+_compiled_kernels = {}
+
+def _compiled(loop):
+    """loop compiled by numba on first use, or None when numba is not installed"""
+    if loop not in _compiled_kernels:
+        try:
+            from numba import njit
+        except ImportError:
+            njit = None
+        _compiled_kernels[loop] = njit(cache=True)(loop) if njit is not None else None
+    return _compiled_kernels[loop]
+
+def _last_per_id(ids, timestamps):
+    """Each id's last event in file order, like a dict overwrite; ids come back sorted"""
+    # return_index reports first occurrences (a stable sort), so search the reversed arrays
+    ids, first = np.unique(ids[::-1], return_index=True)
+    return ids, timestamps[::-1][first]
+
+def _within(durations, lo: Optional[int], hi: Optional[int]):
+    """Drop durations outside the optional [lo, hi] bounds"""
+    if lo is None and hi is None:
+        return durations
+    keep = np.ones(durations.size, dtype=bool)
+    if lo is not None:
+        keep &= durations >= lo
+    if hi is not None:
+        keep &= durations <= hi
+    return durations[keep]
+
+def pair_by_id(start_ids, start_ts, end_ids, end_ts, lo: Optional[int] = None, hi: Optional[int] = None):
+    """Match start/end events on a shared id, return end - start kept within [lo, hi]"""
+    start_ids = np.asarray(start_ids, dtype=np.int64)
+    start_ts = np.asarray(start_ts, dtype=np.int64)
+    end_ids = np.asarray(end_ids, dtype=np.int64)
+    end_ts = np.asarray(end_ts, dtype=np.int64)
+
+    if start_ids.size == 0 or end_ids.size == 0:
+        return np.empty(0, dtype=np.int64)
+
+    id_max = int(end_ids.max())
+    dense = end_ids.min() >= 0 and id_max < DENSE_ID_SPAN * end_ids.size
+    if start_ids.size + end_ids.size >= JIT_MIN_EVENTS:
+        # Large traces only: one compiled pass pairs and filters with no sort.
+        # The dense kernel uses the lookup table below, the hashed one a typed dict
+        kernel = _compiled(_match_dense_loop if dense else _match_hashed_loop)
+        if kernel is not None:
+            lo = INT64_MIN if lo is None else lo
+            hi = INT64_MAX if hi is None else hi
+            if dense:
+                return kernel(start_ids, start_ts, end_ids, end_ts, id_max, lo, hi)
+            return kernel(start_ids, start_ts, end_ids, end_ts, lo, hi)
+
+    # A repeated id is timed from its last start to its last end, as in the
+    # dict-based fallback; both sides come back sorted with unique ids
+    start_ids, start_ts = _last_per_id(start_ids, start_ts)
+    end_ids, end_ts = _last_per_id(end_ids, end_ts)
+
+    if dense:
+        # Frame/inference ids are normally small counters: scatter ends into an
+        # id-indexed table and look starts up directly. The ends are unique, so
+        # the fancy assignment has no duplicate indices whose order would matter
+        ends_by_id = np.zeros(id_max + 1, dtype=np.int64)
+        has_end = np.zeros(id_max + 1, dtype=bool)
+        ends_by_id[end_ids] = end_ts
+        has_end[end_ids] = True
+        hit = (start_ids >= 0) & (start_ids <= id_max)
+        hit[hit] = has_end[start_ids[hit]]
+        return _within(ends_by_id[start_ids[hit]] - start_ts[hit], lo, hi)
+
+    idx = np.searchsorted(end_ids, start_ids)
+    hit = idx < end_ids.size
+    hit[hit] = end_ids[idx[hit]] == start_ids[hit]
+
+    return _within(end_ts[idx[hit]] - start_ts[hit], lo, hi)
+
+def pair_with_previous_start(start_ids, start_ts, end_ids, end_ts):
+    """Match each end event to the latest earlier start of its id, return end - start"""
+    ids = np.concatenate((np.asarray(start_ids, dtype=np.int64), np.asarray(end_ids, dtype=np.int64)))
+    timestamps = np.concatenate((np.asarray(start_ts, dtype=np.int64), np.asarray(end_ts, dtype=np.int64)))
+    is_end = np.zeros(ids.size, dtype=bool)
+    is_end[len(start_ids):] = True
+    
+    # Sort by (id, timestamp); at equal timestamps a start sorts before its end
+    order = np.lexsort((is_end, timestamps, ids))
+    ids, timestamps, is_end = ids[order], timestamps[order], is_end[order]
+    
+    # Position of the latest start at or before each row; -1 until the first one
+    last_start = np.maximum.accumulate(np.where(is_end, -1, np.arange(ids.size)))
+    prev = last_start[is_end]
+    hit = prev >= 0
+    hit[hit] = ids[prev[hit]] == ids[is_end][hit]
+    return timestamps[is_end][hit] - timestamps[prev[hit]]
+
+def split_events(trace: TraceColumns) -> EventBuckets:
+    """Split the trace into per-event (ids, timestamps) buckets in one pass"""
+    if np is not None:
+        # Stable argsort on int8 codes is a radix sort; buckets keep file order
+        order = np.argsort(trace.event_code, kind='stable')
+        ids = trace.event_id[order]
+        timestamps = trace.timestamp_ns[order]
+        counts = np.bincount(trace.event_code, minlength=len(EVENT_CODES))
+        ends = np.cumsum(counts)
+        starts = ends - counts
+        return {name: (ids[lo:hi], timestamps[lo:hi])
+                for name, lo, hi in zip(TRACKED_EVENTS, starts, ends)}
+    
+    buckets = {name: ([], []) for name in TRACKED_EVENTS}
+    by_code = list(buckets.values())  # index by int8 code, no name hashing per event
+    for code, event_id, timestamp_ns in zip(trace.event_code, trace.event_id, trace.timestamp_ns):
+        bucket_ids, bucket_ts = by_code[code]
+        bucket_ids.append(event_id)
+        bucket_ts.append(timestamp_ns)
+    return buckets
+
+def compute_latencies(buckets: EventBuckets):
+    """Camera → brake latencies in ms (ndarray with numpy, else array('d')), range-filtered"""
+    camera_ids, camera_ts = buckets[EVENT_CAMERA_FRAME]
+    brake_ids, brake_ts = buckets[EVENT_BRAKE_ACTUATED]
+
+    if np is not None:
+        latencies_ns = pair_by_id(camera_ids, camera_ts, brake_ids, brake_ts,
+                                  LATENCY_MIN_NS, LATENCY_MAX_NS)
+        latencies_ms = latencies_ns / NS_PER_MS
+    else:
+        camera_frames = dict(zip(camera_ids, camera_ts))
+        brake_events = dict(zip(brake_ids, brake_ts))
+
+        # Frame order is irrelevant to the stats (percentiles sort once anyway),
+        # so walk the dict directly instead of sorting its keys first
+        latencies_ms = array('d')  # unboxed doubles, not a PyFloat per sample
+        for frame_id, camera_ns in camera_frames.items():
+            if frame_id in brake_events:
+                latency_ns = brake_events[frame_id] - camera_ns
+
+                if LATENCY_MIN_NS <= latency_ns <= LATENCY_MAX_NS:
+                    latencies_ms.append(latency_ns / NS_PER_MS)
+
+    return latencies_ms
+
+def percentiles(values, qs):
+    """Linear-interpolated percentiles (numpy's default) from a single sort"""
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    result = []
+    for q in qs:
+        pos = q / 100.0 * last
+        lo = int(pos)
+        hi = min(lo + 1, last)
+        result.append(ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo))
+    return result
+
+def analyze_latency(buckets: EventBuckets) -> Dict:
+    """Analyze end-to-end latency from camera to brake"""
+    latencies_ms = compute_latencies(buckets)
+    
+    if len(latencies_ms) == 0:
         return {'error': 'No valid latency measurements'}
     
     if np is not None:
+        lat = np.asarray(latencies_ms, dtype=np.float64)
+        mean = lat.mean()
+        centered = lat - mean  # reuse the mean instead of lat.std() recomputing it
+        # One partition serves every quantile plus min/max; lat is a scratch array
+        # here, so let numpy reorder it in place instead of copying it first
+        p0, p50, p95, p99, p99_9, p99_99, p100 = np.percentile(
+            lat, [0, 50, 95, 99, 99.9, 99.99, 100], overwrite_input=True)
         stats = {
-            'count': len(latencies_ms),
-            'mean': float(np.mean(latencies_ms)),
-            'median': float(np.median(latencies_ms)),
-            'std': float(np.std(latencies_ms)),
-            'min': float(np.min(latencies_ms)),
-            'max': float(np.max(latencies_ms)),
-            'p50': float(np.percentile(latencies_ms, 50)),
-            'p95': float(np.percentile(latencies_ms, 95)),
-            'p99': float(np.percentile(latencies_ms, 99)),
-            'p99_9': float(np.percentile(latencies_ms, 99.9)),
-            'p99_99': float(np.percentile(latencies_ms, 99.99)),
+            'count': int(lat.size),
+            'mean': float(mean),
+            'median': float(p50),
+            'std': float(np.sqrt(centered.dot(centered) / lat.size)),
+            'min': float(p0),
+            'max': float(p100),
+            'p50': float(p50),
+            'p95': float(p95),
+            'p99': float(p99),
+            'p99_9': float(p99_9),
+            'p99_99': float(p99_99),
         }
     else:
+        p0, p50, p95, p99, p99_9, p99_99, p100 = percentiles(
+            latencies_ms, [0, 50, 95, 99, 99.9, 99.99, 100])
+        # fmean skips mean()'s exact-fraction arithmetic; stdev reuses it as xbar
+        mean = statistics.fmean(latencies_ms)
         stats = {
             'count': len(latencies_ms),
-            'mean': statistics.mean(latencies_ms),
-            'median': statistics.median(latencies_ms),
-            'std': statistics.stdev(latencies_ms) if len(latencies_ms) > 1 else 0.0,
-            'min': min(latencies_ms),
-            'max': max(latencies_ms),
+            'mean': mean,
+            'median': p50,
+            'std': statistics.stdev(latencies_ms, mean) if len(latencies_ms) > 1 else 0.0,
+            'min': p0,
+            'max': p100,
+            'p50': p50,
+            'p95': p95,
+            'p99': p99,
+            'p99_9': p99_9,
+            'p99_99': p99_99,
         }
     
     stats['jitter'] = stats.get('p99_99', stats['max']) - stats['median']
     return stats
 
-def analyze_npu(events: List[Dict]) -> Dict:
+def analyze_npu(buckets: EventBuckets, baseline_ms: Optional[float] = None) -> Dict:
     """Analyze NPU inference timing"""
-    npu_start = {}
-    npu_durations = []
+    start_ids, start_ts = buckets[EVENT_NPU_START]
+    end_ids, end_ts = buckets[EVENT_NPU_END]
     
-    for event in events:
-        event_name = event.get('event_name', '')
-        inference_id = event.get('fields', {}).get('inference_id')
-        timestamp_ns = event.get('timestamp_ns')
-        
-        if event_name == 'halo_npu_inference_start' and inference_id is not None:
-            npu_start[inference_id] = timestamp_ns
-        elif event_name == 'halo_npu_inference_end' and inference_id is not None:
-            if inference_id in npu_start:
-                duration_ns = timestamp_ns - npu_start[inference_id]
-                duration_ms = duration_ns / 1_000_000.0
-                npu_durations.append(duration_ms)
-    
-    if not npu_durations:
+    # Only the mean is reported, so reduce to an exact integer ns sum and a count
+    if np is not None:
+        # Each end is timed from the latest start of its id before it; a start
+        # with several ends is reused, and an end with no start is dropped
+        npu_durations_ns = pair_with_previous_start(start_ids, start_ts, end_ids, end_ts)
+        count = int(npu_durations_ns.size)
+        total_ns = int(npu_durations_ns.sum())
+    else:
+        # Same order as pair_with_previous_start: by id, then time, starts first
+        events = sorted([*((iid, ts, False) for iid, ts in zip(start_ids, start_ts)),
+                         *((iid, ts, True) for iid, ts in zip(end_ids, end_ts))])
+        count = total_ns = 0
+        start_id = start_ns = None
+        for iid, ts, is_end in events:
+            if not is_end:
+                start_id, start_ns = iid, ts
+            elif iid == start_id:
+                total_ns += ts - start_ns
+                count += 1
+    
+    if count == 0:
         return {'error': 'No NPU measurements'}
     
-    mean_duration = statistics.mean(npu_durations)
-    baseline = mean_duration * 0.85  # Assume 15% overhead
+    mean_duration = total_ns / count / NS_PER_MS
+    
+    if baseline_ms is not None:
+        baseline = baseline_ms
+    else:
+        baseline = mean_duration * 0.85  # Assume 15% overhead
     overhead_pct = ((mean_duration - baseline) / baseline) * 100.0
     
     return {
-        'count': len(npu_durations),
+        'count': count,
         'mean_duration_ms': mean_duration,
         'baseline_ms': baseline,
+        'baseline_measured': baseline_ms is not None,
         'overhead_percent': overhead_pct,
     }
 
+def cache_key(events_files: List[Path], *params) -> str:
+    """Fingerprint the inputs by path, size and mtime (plus params) without reading them"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"v{CACHE_VERSION};{';'.join(map(repr, params))};".encode())
+    for events_file in events_files:
+        st = events_file.stat()
+        digest.update(f"{events_file.resolve()}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+def write_atomic(path: Path, write) -> None:
+    """Call write(f) on a temp file, then rename it over path: an interrupted run
+    never leaves a truncated cache entry behind for the next one to load"""
+    tmp_file = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_file, 'wb') as f:
+            write(f)
+        os.replace(tmp_file, path)
+    except BaseException:
+        tmp_file.unlink(missing_ok=True)
+        raise
+
+def load_columns(events_files: List[Path], jobs: Optional[int], columns_file: Optional[Path]) -> TraceColumns:
+    """parse_files, reusing the columns an earlier run saved to columns_file (numpy only)"""
+    if columns_file is None or np is None:
+        return parse_files(events_files, jobs)
+    
+    if columns_file.exists():
+        log(f"Using cached columns: {columns_file}")
+        with np.load(columns_file) as saved:
+            return TraceColumns(saved['timestamp_ns'], saved['event_code'], saved['event_id'])
+    
+    trace = parse_files(events_files, jobs)
+    write_atomic(columns_file, lambda f: np.savez(f, timestamp_ns=trace.timestamp_ns,
+                                                  event_code=trace.event_code, event_id=trace.event_id))
+    return trace
+
+def analyze_files(events_files: List[Path], jobs: Optional[int], npu_baseline: Optional[float],
+                  verbose: bool = False, columns_file: Optional[Path] = None) -> Optional[Dict]:
+    """Parse and analyze trace files, or None when no tracked events were found"""
+    trace = load_columns(events_files, jobs, columns_file)
+    if len(trace) == 0:
+        return None
+    
+    buckets = split_events(trace)
+    if verbose:
+        for name, (ids, _) in buckets.items():
+            log(f"  {name}: {len(ids)}")
+    
+    return {
+        'events': len(trace),
+        'latency': analyze_latency(buckets),
+        'npu': analyze_npu(buckets, npu_baseline),
+    }
+
+def cached_analysis(events_files: List[Path], cache_dir: Optional[Path], jobs: Optional[int] = None,
+                    npu_baseline: Optional[float] = None, verbose: bool = False) -> Optional[Dict]:
+    """analyze_files memoized on disk in an existing cache_dir; None disables caching"""
+    if cache_dir is None:
+        return analyze_files(events_files, jobs, npu_baseline, verbose)
+    
+    cache_file = cache_dir / f"{cache_key(events_files, npu_baseline)}.json"
+    if cache_file.exists():
+        log(f"Using cached analysis: {cache_file}")
+        return json_loads(cache_file.read_bytes())
+    
+    # Parsed columns don't depend on the analysis options, so they get their own
+    # entry: e.g. a new --npu-baseline re-analyzes without decoding JSON again
+    columns_file = cache_dir / f"{cache_key(events_files, 'columns')}.npz"
+    results = analyze_files(events_files, jobs, npu_baseline, verbose, columns_file)
+    if results is not None:
+        write_atomic(cache_file, lambda f: f.write(json_dumps(results)))
+    return results
+
 def generate_report(latency_stats: Dict, npu_stats: Dict, output_file: Path):
     """Generate text report"""
     with open(output_file, 'w') as f:
@@ -165,34 +749,49 @@ def generate_report(latency_stats: Dict, npu_stats: Dict, output_file: Path):
             f.write("-" * 40 + "\n")
             f.write(f"Sample Count:        {npu_stats['count']}\n")
             f.write(f"Mean Duration:       {npu_stats['mean_duration_ms']:.2f} ms\n")
-            f.write(f"Baseline (est):      {npu_stats['baseline_ms']:.2f} ms\n")
+            label = "Baseline:" if npu_stats['baseline_measured'] else "Baseline (est):"
+            f.write(f"{label:<21}{npu_stats['baseline_ms']:.2f} ms\n")
             f.write(f"Overhead:            {npu_stats['overhead_percent']:.1f} %\n")
         
         f.write("\n" + "=" * 80 + "\n")
 
 def main():
     parser = argparse.ArgumentParser(description='Analyze Halo.OS VBS traces')
-    parser.add_argument('events_file', type=Path, help='Path to events.jsonl')
+    parser.add_argument('events_files', type=Path, nargs='*', help='Path(s) to events.jsonl (or .parquet, with polars)')
+    parser.add_argument('--trace', type=Path, help='Trace directory; its events.jsonl and those one level down are analyzed')
     parser.add_argument('--output', '-o', type=Path, help='Output directory')
+    parser.add_argument('--npu-baseline', type=float, metavar='BASELINE_MS',
+                        help='Measured native NPU inference time (default: estimate)')
+    parser.add_argument('--verbose', action='store_true', help='Log per-event counts')
+    parser.add_argument('--jobs', '-j', type=int, help='Parser processes for multiple files (default: CPU count)')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore and do not write OUTPUT/.cache results')
     
     args = parser.parse_args()
     
-    if not args.events_file.exists():
-        log(f"ERROR: File not found: {args.events_file}")
-        return 1
+    if not args.events_files:
+        if args.trace is None:
+            parser.error('either events_files or --trace is required')
+        args.events_files = [*args.trace.glob('events.jsonl'), *sorted(args.trace.glob('*/events.jsonl'))]
+        if not args.events_files:
+            log(f"ERROR: No events.jsonl file found in {args.trace}")
+            return 1
+    
+    for events_file in args.events_files:
+        if not events_file.exists():
+            log(f"ERROR: File not found: {events_file}")
+            return 1
     
-    output_dir = args.output or args.events_file.parent
-    output_dir.mkdir(parents=True, exist_ok=True)
+    output_dir = args.output or args.events_files[0].parent
+    cache_dir = None if args.no_cache else output_dir / '.cache'
+    (cache_dir or output_dir).mkdir(parents=True, exist_ok=True)  # one call creates both
     
-    log(f"Analyzing: {args.events_file}")
+    log(f"Analyzing: {', '.join(str(f) for f in args.events_files)}")
     
-    events = parse_events(args.events_file)
-    if not events:
+    results = cached_analysis(args.events_files, cache_dir, args.jobs, args.npu_baseline, args.verbose)
+    if results is None:
         log("ERROR: No events found")
         return 1
-    
-    latency_stats = analyze_latency(events)
-    npu_stats = analyze_npu(events)
+    latency_stats, npu_stats = results['latency'], results['npu']
     
     report_file = output_dir / "analysis_report.txt"
     generate_report(latency_stats, npu_stats, report_file)
@@ -1,18 +1,177 @@
 #!/usr/bin/env python3
+import argparse
+import json
+import mmap
+import os
+import re
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import sys
-
-df = pd.read_json(sys.argv[1], lines=True)
-ingest = df[df['name'] == 'halo_camera_ingest'].set_index('frame_id')['time']
-actuate = df[df['name'] == 'halo_brake_actuate'].set_index('frame_id')['time']
-lat_ms = (actuate - ingest) / 1e6
-
-plt.figure(figsize=(10,5))
-plt.plot(lat_ms.values, marker='o')
-plt.title("Camera → Brake Latency")
-plt.xlabel("Frame")
-plt.ylabel("Latency (ms)")
-plt.grid(True)
-plt.savefig("latency_plot.png")
-plt.show()
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.json as paj
+    ARROW_SCHEMA = pa.schema([('name', pa.string()), ('frame_id', pa.int64()), ('time', pa.int64())])
+except ImportError:
+    pa = None
+
+INGEST = 'halo_camera_ingest'
+ACTUATE = 'halo_brake_actuate'
+PLOTTED = frozenset((INGEST, ACTUATE))
+PLOTTED_PATTERN = re.compile(b'"(?:' + b'|'.join(re.escape(name.encode()) for name in (INGEST, ACTUATE)) + b')"')
+EVENT_DTYPE = pd.CategoricalDtype([INGEST, ACTUATE])
+INGEST_CODE = EVENT_DTYPE.categories.get_loc(INGEST)
+ACTUATE_CODE = EVENT_DTYPE.categories.get_loc(ACTUATE)
+ARROW_BLOCK_BYTES = 16 << 20
+NS_PER_MS = 1_000_000
+PLOT_BUCKETS = 4000  # series longer than this are drawn as a min/max envelope
+CACHE_VERSION = 1  # bump when compute_latency output changes
+
+def plotted_lines(buf):
+    # One regex sweep over the mapped trace in C; yields each matching line once
+    line_end = 0
+    for match in PLOTTED_PATTERN.finditer(buf):
+        if match.start() < line_end:
+            continue
+        line_start = buf.rfind(b'\n', 0, match.start()) + 1
+        line_end = buf.find(b'\n', match.end())
+        if line_end < 0:
+            line_end = len(buf)
+        yield buf[line_start:line_end]
+
+def load_trace(path):
+    if pa is not None:
+        # Arrow's multi-threaded C++ reader yields typed columns; filter before pandas.
+        # The fixed schema skips per-block type inference and drops unused fields
+        options = paj.ReadOptions(use_threads=True, block_size=ARROW_BLOCK_BYTES)
+        parse = paj.ParseOptions(explicit_schema=ARROW_SCHEMA, unexpected_field_behavior='ignore')
+        try:
+            table = paj.read_json(path, read_options=options, parse_options=parse)
+        except pa.ArrowInvalid:
+            # Arrow rejects the whole file over any line it can't parse, plotted
+            # or not (e.g. a repeated key); the line loader below only decodes
+            # the plotted events
+            pass
+        else:
+            table = table.filter(pc.is_in(table['name'], value_set=pa.array([INGEST, ACTUATE])))
+            # Hash names once in Arrow so pandas receives integer codes, not strings
+            table = table.set_column(0, 'name', pc.dictionary_encode(table['name']))
+            df = table.to_pandas()
+            df['name'] = df['name'].astype(EVENT_DTYPE)
+            return df
+
+    # Decode only the lines naming a plotted event, keeping them as typed columns
+    names, frame_ids, times = [], [], []
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                for line in plotted_lines(buf):
+                    event = json_loads(line)
+                    if event.get('name') in PLOTTED:
+                        names.append(event['name'])
+                        frame_ids.append(event['frame_id'])
+                        times.append(event['time'])
+    return pd.DataFrame({
+        'name': pd.Categorical(names, dtype=EVENT_DTYPE),
+        'frame_id': np.asarray(frame_ids, dtype=np.int64),
+        'time': np.asarray(times, dtype=np.int64),
+    })
+
+def first_per_frame(frame_ids, times):
+    # np.unique sorts the ids and reports each one's first row, so a repeated
+    # frame_id keeps its earliest event
+    frame_ids, first = np.unique(frame_ids, return_index=True)
+    return frame_ids, times[first]
+
+def compute_latency(df):
+    # Binary-search join on sorted frame ids in plain int64 arrays, no pandas
+    # merge; returns contiguous int64 ns in frame order
+    codes = df['name'].cat.codes.to_numpy()  # int8 compares, not per-row string ones
+    frame_ids = df['frame_id'].to_numpy()
+    times = df['time'].to_numpy()
+    ingest = codes == INGEST_CODE
+    actuate = codes == ACTUATE_CODE
+    ingest_ids, ingest_ns = first_per_frame(frame_ids[ingest], times[ingest])
+    actuate_ids, actuate_ns = first_per_frame(frame_ids[actuate], times[actuate])
+
+    idx = np.searchsorted(actuate_ids, ingest_ids)
+    hit = idx < actuate_ids.size
+    hit[hit] = actuate_ids[idx[hit]] == ingest_ids[hit]
+    return actuate_ns[idx[hit]] - ingest_ns[hit]
+
+def latency_cache(path):
+    # Keyed on size and mtime, so a rewritten trace never reuses stale latencies
+    st = os.stat(path)
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), '.cache')
+    name = f"{os.path.basename(path)}.v{CACHE_VERSION}.{st.st_size}-{st.st_mtime_ns}.latency.npy"
+    return os.path.join(cache_dir, name)
+
+def load_latency(path, use_cache=True):
+    if not use_cache:
+        return compute_latency(load_trace(path))
+    cache_file = latency_cache(path)
+    if os.path.exists(cache_file):
+        # Memory-mapped: re-plotting a trace skips JSON decoding and copies nothing
+        return np.load(cache_file, mmap_mode='r')
+    lat_ns = compute_latency(load_trace(path))
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    # Saved under a temp name and renamed into place, so an interrupted run
+    # never leaves a truncated file for the next one to map
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'wb') as f:
+        np.save(f, lat_ns)
+    os.replace(tmp_file, cache_file)
+    return lat_ns
+
+def plot_latency(lat_ns, out_file):
+    # Imported here so --no-plot runs never pay the matplotlib import. A bare
+    # Figure on an Agg canvas skips pyplot's global state and backend lookup
+    from matplotlib import rc_context
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    lat_ms = lat_ns / NS_PER_MS
+    # The threshold is read when line paths are built, so it has to cover the
+    # whole figure: Agg then merges series segments deviating under a pixel
+    with rc_context({'path.simplify_threshold': 1.0}):
+        fig = Figure(figsize=(10,5))
+        canvas = FigureCanvasAgg(fig)
+        ax = fig.subplots()
+        if lat_ms.size > PLOT_BUCKETS:
+            # Long runs: draw the per-bucket min/max envelope, O(buckets) for matplotlib
+            step = -(-lat_ms.size // PLOT_BUCKETS)
+            starts = np.arange(0, lat_ms.size, step)
+            ax.fill_between(starts, np.minimum.reduceat(lat_ms, starts),
+                                   np.maximum.reduceat(lat_ms, starts), alpha=0.4, step='post')
+        else:
+            # A plain line is one path; a marker per frame is stamped point by point
+            ax.plot(lat_ms, linewidth=0.5)
+        ax.set_title("Camera → Brake Latency")
+        ax.set_xlabel("Frame")
+        ax.set_ylabel("Latency (ms)")
+        ax.grid(True)
+        canvas.print_png(out_file)
+
+def main():
+    parser = argparse.ArgumentParser(description='Plot camera → brake latency')
+    parser.add_argument('jsonl')
+    parser.add_argument('--output', '-o', default='latency_plot.png')
+    parser.add_argument('--no-plot', action='store_true', help='Print the summary only')
+    parser.add_argument('--no-cache', action='store_true', help='Re-parse the trace even if cached')
+    args = parser.parse_args()
+
+    lat_ns = load_latency(args.jsonl, use_cache=not args.no_cache)
+    print(f"Samples: {lat_ns.size}")
+    print(f"Mean latency : {lat_ns.mean() / NS_PER_MS:.1f} ms")
+
+    if not args.no_plot:
+        plot_latency(lat_ns, args.output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Regression checks for ci/analyze_vbs.py: the numpy, polars and stdlib code paths
+must report the same numbers for the same trace.
+"""
+
+import json
+import statistics
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'ci'))
+
+import analyze_vbs as vbs
+
+MS = vbs.NS_PER_MS
+
+# Frame 1's camera and brake events repeat: only the last of each counts
+CAMERA = ([1, 2, 1], [0, 0, 50 * MS])
+BRAKE = ([1, 2, 1], [90 * MS, 100 * MS, 100 * MS])
+
+def latency_buckets(camera=CAMERA, brake=BRAKE):
+    buckets = {name: ([], []) for name in vbs.TRACKED_EVENTS}
+    buckets[vbs.EVENT_CAMERA_FRAME] = camera
+    buckets[vbs.EVENT_BRAKE_ACTUATED] = brake
+    return buckets
+
+def fallback_latencies(buckets):
+    with mock.patch.object(vbs, 'np', None):
+        return sorted(vbs.compute_latencies(buckets))
+
+class RepeatedIdTest(unittest.TestCase):
+    def test_fallback_keeps_last_start(self):
+        latencies = fallback_latencies(latency_buckets())
+        self.assertEqual(latencies, [50.0, 100.0])
+        self.assertEqual(statistics.fmean(latencies), 75.0)
+
+    @unittest.skipIf(vbs.np is None, 'numpy not installed')
+    def test_numpy_paths_match_fallback(self):
+        np = vbs.np
+        expected = fallback_latencies(latency_buckets())
+        self.assertEqual(sorted(vbs.compute_latencies(latency_buckets())), expected)
+
+        # Sparse ids take the hashed/searchsorted joins instead of the dense table
+        sparse = lambda ids: [i << 40 for i in ids]
+        buckets = latency_buckets((sparse(CAMERA[0]), CAMERA[1]), (sparse(BRAKE[0]), BRAKE[1]))
+        self.assertEqual(sorted(vbs.compute_latencies(buckets)), expected)
+
+        # Kernels (compiled when numba is installed) on both id layouts
+        with mock.patch.object(vbs, 'JIT_MIN_EVENTS', 0):
+            self.assertEqual(sorted(vbs.compute_latencies(latency_buckets())), expected)
+            self.assertEqual(sorted(vbs.compute_latencies(buckets)), expected)
+
+        # The compiled kernels' Python source must agree too
+        args = [np.asarray(c, dtype=np.int64) for c in (*CAMERA, *BRAKE)]
+        hashed = vbs._match_hashed_loop(*args, vbs.INT64_MIN, vbs.INT64_MAX)
+        dense = vbs._match_dense_loop(*args, 2, vbs.INT64_MIN, vbs.INT64_MAX)
+        for durations in (hashed, dense):
+            self.assertEqual(sorted(durations / MS), expected)
+
+# Inference 1 starts twice before ending: the end is timed from the later start
+NPU_START = ([1, 1, 2], [0, 10 * MS, 30 * MS])
+NPU_END = ([1, 2], [20 * MS, 45 * MS])
+
+def npu_buckets(start=NPU_START, end=NPU_END):
+    buckets = {name: ([], []) for name in vbs.TRACKED_EVENTS}
+    buckets[vbs.EVENT_NPU_START] = start
+    buckets[vbs.EVENT_NPU_END] = end
+    return buckets
+
+def baseline_npu(start, end):
+    """The original analyzer's walk: events in time order, each end timed from its id's latest start"""
+    events = sorted([*((ts, False, iid) for iid, ts in zip(*start)),
+                     *((ts, True, iid) for iid, ts in zip(*end))])
+    starts, durations = {}, []
+    for ts, is_end, iid in events:
+        if not is_end:
+            starts[iid] = ts
+        elif iid in starts:
+            durations.append((ts - starts[iid]) / MS)
+    return durations
+
+class NpuPairingTest(unittest.TestCase):
+    def test_fallback_matches_baseline(self):
+        expected = baseline_npu(NPU_START, NPU_END)
+        with mock.patch.object(vbs, 'np', None):
+            stats = vbs.analyze_npu(npu_buckets())
+        self.assertEqual(stats['count'], len(expected))
+        self.assertEqual(stats['mean_duration_ms'], statistics.fmean(expected))
+
+    @unittest.skipIf(vbs.np is None, 'numpy not installed')
+    def test_numpy_times_end_from_previous_start(self):
+        stats = vbs.analyze_npu(npu_buckets())
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(stats['mean_duration_ms'], 12.5)
+
+def write_run(path, camera_ns, brake_ns):
+    """One run's trace: frame ids restart at 1, as every run's do"""
+    with open(path, 'w') as f:
+        for frame_id, (cam, brake) in enumerate(zip(camera_ns, brake_ns), 1):
+            for name, ts in ((vbs.EVENT_CAMERA_FRAME, cam), (vbs.EVENT_BRAKE_ACTUATED, brake)):
+                f.write(json.dumps({'event_name': name, 'timestamp_ns': ts, 'fields': {'frame_id': frame_id}}) + '\n')
+
+class MultiFileTest(unittest.TestCase):
+    def test_ids_pair_within_their_own_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            first, second = Path(tmp) / 'a.jsonl', Path(tmp) / 'b.jsonl'
+            write_run(first, [0, 200 * MS], [10 * MS, 220 * MS])
+            write_run(second, [1000 * MS, 1200 * MS], [1030 * MS, 1240 * MS])
+            results = vbs.analyze_files([first, second], jobs=1, npu_baseline=None)
+        self.assertEqual(results['latency']['count'], 4)
+        self.assertEqual(results['latency']['mean'], 25.0)
+
+def events(trace):
+    """A parsed trace as sorted (timestamp, code, id) rows, whichever parser produced it"""
+    return sorted(zip(*(map(int, column) for column in (trace.timestamp_ns, trace.event_code, trace.event_id))))
+
+def line_parsed(events_file):
+    with mock.patch.object(vbs, 'pl', None):
+        return events(vbs.parse_events(events_file))
+
+# Wall-clock nanoseconds, past float64's exact integer range
+EPOCH_NS = 1_700_000_000_123_456_789
+
+@unittest.skipIf(vbs.pl is None or vbs.np is None, 'polars and numpy not installed')
+class PolarsParseTest(unittest.TestCase):
+    def test_integer_trace_matches_line_parser(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            trace = Path(tmp) / 'events.jsonl'
+            write_run(trace, [EPOCH_NS, EPOCH_NS + 200 * MS], [EPOCH_NS + 10 * MS, EPOCH_NS + 220 * MS])
+            expected = line_parsed(trace)
+            self.assertEqual(len(expected), 4)
+            self.assertEqual(events(vbs.parse_events_polars([trace])), expected)
+            self.assertEqual(events(vbs.parse_events(trace)), expected)
+
+    def test_mixed_ids_match_line_parser(self):
+        # Plain, quoted and integral float ids are kept; fractional and junk ones are skipped
+        ids = [12, "13", 14.0, "15.0", 3.7, "3.7", "junk"]
+        with tempfile.TemporaryDirectory() as tmp:
+            trace = Path(tmp) / 'events.jsonl'
+            with open(trace, 'w') as f:
+                for i, frame_id in enumerate(ids):
+                    f.write(json.dumps({'event_name': vbs.EVENT_CAMERA_FRAME, 'timestamp_ns': EPOCH_NS + i,
+                                        'fields': {'frame_id': frame_id}}) + '\n')
+            expected = line_parsed(trace)
+            self.assertEqual([row[2] for row in expected], [12, 13, 14, 15])
+            self.assertEqual(events(vbs.parse_events_polars([trace])), expected)
+
+    def test_parquet_float_ids_skip_fractions(self):
+        pl = vbs.pl
+        with tempfile.TemporaryDirectory() as tmp:
+            trace = Path(tmp) / 'events.parquet'
+            pl.DataFrame({
+                'timestamp_ns': [EPOCH_NS, EPOCH_NS + 1, EPOCH_NS + 2],
+                'event_name': [vbs.EVENT_CAMERA_FRAME] * 3,
+                'fields': [{'frame_id': 12.0}, {'frame_id': 3.7}, {'frame_id': 14.0}],
+            }).write_parquet(trace)
+            parsed = events(vbs.parse_events_polars([trace]))
+        code = vbs.EVENT_CODES[vbs.EVENT_CAMERA_FRAME]
+        self.assertEqual(parsed, [(EPOCH_NS, code, 12), (EPOCH_NS + 2, code, 14)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Regression checks for ci/visualize.py: the pyarrow and mmap loaders must
+give the same latencies for the same trace.
+"""
+
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'ci'))
+
+try:
+    import visualize
+except ImportError:  # numpy/pandas not installed
+    visualize = None
+
+# Two frames, 12 ms apart from ingest to actuation, plus NPU lines that repeat
+# the "name" key
+SAMPLE_EVENTS = ROOT / 'examples' / 'sample_events.jsonl'
+
+def latencies_ms(path):
+    return list(visualize.compute_latency(visualize.load_trace(path)) / visualize.NS_PER_MS)
+
+@unittest.skipIf(visualize is None, 'numpy/pandas not installed')
+class LoadTraceTest(unittest.TestCase):
+    def test_mmap_loader(self):
+        with mock.patch.object(visualize, 'pa', None):
+            self.assertEqual(latencies_ms(SAMPLE_EVENTS), [12.0, 12.0])
+
+    @unittest.skipIf(visualize is None or visualize.pa is None, 'pyarrow not installed')
+    def test_pyarrow_falls_back_on_lines_it_rejects(self):
+        self.assertEqual(latencies_ms(SAMPLE_EVENTS), [12.0, 12.0])
+
+if __name__ == '__main__':
+    unittest.main()